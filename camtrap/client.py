@@ -2,7 +2,6 @@
 # python client.py --server-ip SERVER_IP
 
 # import the necessary packages
-from cv2 import CLAHE
 from imutils.video import VideoStream
 import imagezmq
 import argparse
@@ -11,19 +10,9 @@ import time
 import cv2
 
 
-def enchance_img(frame):
-		temp_img = frame 
-		wb = cv2.xphoto.createGrayworldWB()
-		wb.setSaturationThreshold(0.99)
-		img_wb = wb.balanceWhite(temp_img)
-		img_lab = cv2.cvtColor(img_wb,cv2.COLOR_BGR2LAB)
-		l,a,b = cv2.split(img_lab)
-		# print(type(l))
-		# g_l = cv2.cvtColor(l,cv2.COLOR_BGR2GRAY)
-		clahe = cv2.createCLAHE(clipLimit=6,tileGridSize=(8,8))
-		img_l = clahe.apply(l)
-		img_clahe = cv2.merge((img_l,a,b))
-		return cv2.cvtColor(img_clahe,cv2.COLOR_Lab2BGR)
+# frames are sent JPEG-compressed; raw arrays are ~6 MB per 1080p frame, and the detector
+# resizes internally so quality 85 loses nothing it can see
+JPEG_QUALITY = 85
 
 sender = imagezmq.ImageSender(connect_to="tcp://{}:5555".format('127.0.0.1'))
 
@@ -40,6 +29,10 @@ time.sleep(2.0)
 while True:
     	
 	frame = vs.read()
-	sender.send_image(rpiName, (frame))
+	ret, jpg_buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+	if not ret:
+		print("failed to encode frame, skipping it")
+		continue
+	sender.send_jpg(rpiName, jpg_buffer)
 
 
@@ -15,15 +15,26 @@ import numpy as np
 
 def truncate_float_array(xs, precision=3):
     """
-    Vectorized version of truncate_float(...)
+    Vectorized version of truncate_float(...), computed with NumPy over the whole array
 
     Args:
-    x         (list of float) List of floats to truncate
+    x         (list of float) List (or np.array) of floats to truncate
     precision (int)           The number of significant digits to preserve, should be
                               greater or equal 1
+
+    Returns a list of Python floats
     """
 
-    return [truncate_float(x, precision=precision) for x in xs]
+    assert precision > 0
+
+    xs = np.asarray(xs, dtype=np.float64)
+    truncated = np.zeros_like(xs)
+    nonzero = ~np.isclose(xs, 0)
+    x = xs[nonzero]
+    # same computation as truncate_float, see there
+    factor = np.power(10.0, precision - 1 - np.floor(np.log10(np.abs(x))))
+    truncated[nonzero] = np.floor(x * factor) / factor
+    return truncated.tolist()
 
 
 def truncate_float(x, precision=3):
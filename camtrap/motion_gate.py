@@ -0,0 +1,50 @@
+"""
+motion_gate.py
+
+Cheap frame-difference gate used to skip the detector on static camera trap frames
+"""
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Keeps a running-average background of downsampled grayscale frames and reports whether a
+    new frame differs enough from it to be worth running the detector on. The running average
+    makes the gate robust to slow lighting changes.
+    """
+
+    # (width, height) frames are reduced to before differencing
+    SMALL_SIZE = (160, 90)
+
+    # mean absolute difference (0-255) below which a frame is considered static
+    DEFAULT_THRESHOLD = 2.0
+
+    # weight of the newest frame in the running-average background
+    DEFAULT_ALPHA = 0.05
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, alpha=DEFAULT_ALPHA):
+        self.threshold = threshold
+        self.alpha = alpha
+        self.background = None
+
+    def has_motion(self, frame):
+        """
+        Check a BGR frame against the background, then fold it into the background.
+
+        Args:
+        frame (np.ndarray) BGR frame of any size
+
+        Returns True if the frame changed by at least threshold; the first frame always does.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        cur_small = cv2.resize(gray, MotionGate.SMALL_SIZE, interpolation=cv2.INTER_AREA)
+
+        if self.background is None:
+            self.background = cur_small.astype(np.float32)
+            return True
+
+        motion = cv2.absdiff(cur_small, cv2.convertScaleAbs(self.background)).mean()
+        cv2.accumulateWeighted(cur_small, self.background, self.alpha)
+
+        return motion >= self.threshold
@@ -0,0 +1,93 @@
+"""
+preproc.py
+
+Frame enhancement shared by the client, test and video scripts: gray-world white balance
+followed by CLAHE on the L channel of the LAB image.
+
+When OpenCV is built with CUDA and a device is present, the color conversions and CLAHE run
+on the GPU (cv2.cuda); otherwise everything runs on the CPU. The gray-world white balance has
+no CUDA implementation and always runs on the CPU.
+"""
+import cv2
+import numpy as np
+
+
+WB_SATURATION_THRESHOLD = 0.99
+CLAHE_CLIP_LIMIT = 6
+CLAHE_TILE_GRID_SIZE = (8, 8)
+
+
+def _cuda_available():
+    """
+    True if this OpenCV build has the CUDA module and can see at least one device
+    """
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+
+USE_CUDA = _cuda_available()
+
+# The white balance and CLAHE objects and the LAB buffers are created once and reused for
+# every frame. The white balance object is created on first use, since cv2.xphoto is only
+# present in opencv-contrib builds.
+_WB = None
+_CLAHE = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID_SIZE)
+_lab_buf = None
+_l_buf = None
+
+if USE_CUDA:
+    _CUDA_CLAHE = cv2.cuda.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT,
+                                       tileGridSize=CLAHE_TILE_GRID_SIZE)
+    _gpu_img = cv2.cuda_GpuMat()
+    _gpu_lab = cv2.cuda_GpuMat()
+
+
+def _white_balance(frame):
+    global _WB
+    if _WB is None:
+        _WB = cv2.xphoto.createGrayworldWB()
+        _WB.setSaturationThreshold(WB_SATURATION_THRESHOLD)
+    return _WB.balanceWhite(frame)
+
+
+def _clahe_cpu(img_wb):
+    global _lab_buf, _l_buf
+    if _lab_buf is None or _lab_buf.shape != img_wb.shape:
+        _lab_buf = np.empty_like(img_wb)
+        _l_buf = np.empty(img_wb.shape[:2], np.uint8)
+
+    cv2.cvtColor(img_wb, cv2.COLOR_BGR2LAB, dst=_lab_buf)
+    # only L is equalized: copy it out, apply CLAHE in place and write it back, rather than
+    # splitting all three channels and merging them again
+    cv2.extractChannel(_lab_buf, 0, dst=_l_buf)
+    _CLAHE.apply(_l_buf, dst=_l_buf)
+    cv2.insertChannel(_l_buf, _lab_buf, 0)
+    return cv2.cvtColor(_lab_buf,cv2.COLOR_Lab2BGR)
+
+
+def _clahe_cuda(img_wb):
+    # upload and cvtColor only reallocate device memory when the frame size changes
+    _gpu_img.upload(img_wb)
+    cv2.cuda.cvtColor(_gpu_img, cv2.COLOR_BGR2LAB, _gpu_lab)
+    l, a, b = cv2.cuda.split(_gpu_lab)
+    gpu_l = _CUDA_CLAHE.apply(l, cv2.cuda.Stream_Null())
+    cv2.cuda.merge([gpu_l, a, b], _gpu_lab)
+    cv2.cuda.cvtColor(_gpu_lab, cv2.COLOR_Lab2BGR, _gpu_img)
+    return _gpu_img.download()
+
+
+def enchance_img(frame):
+    """
+    White-balance a BGR frame and equalize its lightness with CLAHE.
+
+    Args:
+    frame (np.ndarray) BGR uint8 frame
+
+    Returns the enhanced BGR uint8 frame
+    """
+    img_wb = _white_balance(frame)
+    if USE_CUDA:
+        return _clahe_cuda(img_wb)
+    return _clahe_cpu(img_wb)
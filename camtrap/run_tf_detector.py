@@ -43,6 +43,7 @@ https://github.com/tensorflow/models/blob/master/research/object_detection/infer
 import argparse
 import glob
 import os
+import shutil
 import statistics
 import sys
 import time
@@ -57,7 +58,7 @@ import humanfriendly
 import numpy as np
 from tqdm import tqdm
 
-from ct_utils import truncate_float
+from ct_utils import truncate_float, truncate_float_array
 import visualization.visualization_utils as viz_utils
 
 # ignoring all "PIL cannot read EXIF metainfo for the images" warnings
@@ -72,6 +73,11 @@ warnings.filterwarnings('ignore', category=FutureWarning)
 # Useful hack to force CPU inference
 # os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
 
+# Pin OpenMP threads (used by the MKL/oneDNN CPU kernels) to cores; must be set before
+# tensorflow is imported. Values already in the environment take precedence.
+os.environ.setdefault('OMP_NUM_THREADS', str(os.cpu_count()))
+os.environ.setdefault('KMP_AFFINITY', 'granularity=fine,compact')
+
 import tensorflow.compat.v1 as tf
 
 # print('TensorFlow version:', tf.__version__)
@@ -123,17 +129,18 @@ class ImagePathUtils:
 class TFDetector:
     """
     A detector model loaded at the time of initialization. It is intended to be used with
-    the MegaDetector (TF). The inference batch size is set to 1; code needs to be modified
-    to support larger batch sizes, including resizing appropriately.
+    the MegaDetector (TF). Frames are run through the graph in micro-batches; all images
+    in one batch must share the same resolution (true for frames from a single stream).
     """
 
     # Number of decimal places to round to for confidence and bbox coordinates
     CONF_DIGITS = 3
     COORD_DIGITS = 4
 
-    # MegaDetector was trained with batch size of 1, and the resizing function is a part
-    # of the inference graph
-    BATCH_SIZE = 1
+    # Number of same-sized frames stacked into one inference call. The resizing function is
+    # a part of the inference graph, so every image in a batch needs the same resolution.
+    # Kept below 16, past which TF switches conv kernels and latency stops scaling sublinearly.
+    BATCH_SIZE = 8
 
     # An enumeration of failure reasons
     FAILURE_TF_INFER = 'Failure TF inference'
@@ -150,16 +157,84 @@ class TFDetector:
 
     NUM_DETECTOR_CATEGORIES = 4  # animal, person, group, vehicle - for color assignment
 
-    def __init__(self, model_path):
-        """Loads model from model_path and starts a tf.Session with this graph. Obtains
-        input and output tensor handles."""
-        detection_graph = TFDetector.__load_model(model_path)
-        self.tf_session = tf.Session(graph=detection_graph)
+    # Input and output tensors of the frozen graph
+    INPUT_TENSOR = 'image_tensor:0'
+    OUTPUT_TENSORS = ['detection_boxes:0', 'detection_scores:0', 'detection_classes:0']
+
+    # Supported inference precisions: 'fp32' runs the frozen graph as is, 'fp16' runs an
+    # FP16-quantized TFLite conversion of it. INT8 is deliberately not offered, its TFLite
+    # kernels are unoptimized on x86 and run several times slower than FP32 there.
+    PRECISIONS = ['fp32', 'fp16']
+
+    # TF thread pools: one thread per core within an op, and few ops in parallel, which
+    # avoids oversubscribing consumer CPUs with the default settings
+    INTRA_OP_THREADS = os.cpu_count()
+    INTER_OP_THREADS = 2
+
+    def __init__(self, model_path, precision='fp32', use_xla=True, use_trt=False):
+        """Loads model from model_path and wraps the graph in a ConcreteFunction that maps a
+        uint8 image batch to the box, score and class tensors.
+
+        Args:
+            model_path: .pb file of the model
+            precision: one of PRECISIONS; with 'fp16' the model is run by the TFLite interpreter
+                and use_xla and use_trt are ignored
+            use_xla: enable XLA JIT compilation (auto-clustering) of the graph
+            use_trt: convert the graph with TF-TRT at FP16 precision; needs a GPU and a
+                TensorFlow build with TensorRT, otherwise the graph runs without it
+        """
+        TFDetector.__configure_runtime()
+
+        if precision not in TFDetector.PRECISIONS:
+            raise ValueError('precision must be one of {}, got {}'.format(
+                TFDetector.PRECISIONS, precision))
+        self.precision = precision
+        self.model_path = model_path
+
+        # input batch buffer, allocated on the first batch (see __fill_feed_buffer)
+        self.feed_buf = None
+
+        # once warmup has fixed the batch size, every inference call is padded to this many
+        # images so the model always sees the same input shape; until then (None) each batch
+        # is run at its own size, so a single image costs a single image
+        self.batch_size = None
+
+        # GraphDef kept to build the shape-specialized function in warmup, which releases it;
+        # None when the model is run by TFLite or TensorRT instead
+        self.graph_def = None
+
+        # loaded TF-TRT SavedModel when the graph was converted (see __convert_trt)
+        self.trt_model = None
+
+        if precision == 'fp16':
+            # TFLite needs a static image size, so the interpreter is built on the first batch
+            # of a given resolution (see __load_tflite)
+            self.interpreter = None
+            self.tflite_image_size = None
+            return
+
+        if use_xla:
+            tf.config.optimizer.set_jit(True)
+
+        self.graph_def = TFDetector.__load_model(model_path)
+        self.detect_fn = TFDetector.__wrap_graph(self.graph_def)
+
+        if use_trt:
+            self.__convert_trt(model_path)
 
-        self.image_tensor = detection_graph.get_tensor_by_name('image_tensor:0')
-        self.box_tensor = detection_graph.get_tensor_by_name('detection_boxes:0')
-        self.score_tensor = detection_graph.get_tensor_by_name('detection_scores:0')
-        self.class_tensor = detection_graph.get_tensor_by_name('detection_classes:0')
+    @staticmethod
+    def __configure_runtime():
+        """Sets the TF thread pool sizes and lets GPU memory grow on demand. This only works
+        before the TF runtime is initialized; later calls (e.g., a second TFDetector) leave
+        the existing settings in place.
+        """
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(TFDetector.INTRA_OP_THREADS)
+            tf.config.threading.set_inter_op_parallelism_threads(TFDetector.INTER_OP_THREADS)
+            for gpu in tf.config.experimental.list_physical_devices('GPU'):
+                tf.config.experimental.set_memory_growth(gpu, True)
+        except RuntimeError:
+            pass
 
     @staticmethod
     def round_and_make_float(d, precision=4):
@@ -172,21 +247,21 @@ class TFDetector:
         (including model outputs) are normalized in the range [0, 1].
 
         Args:
-            tf_coords: np.array of predicted bounding box coordinates from the TF detector,
-                has format [y1, x1, y2, x2]
+            tf_coords: np.array of shape (N, 4) of predicted bounding box coordinates from the
+                TF detector, each row has format [y1, x1, y2, x2]
 
-        Returns: list of Python float, predicted bounding box coordinates [x1, y1, width, height]
+        Returns: list of N lists of Python float, predicted bounding box coordinates
+            [x1, y1, width, height]
         """
-        # change from [y1, x1, y2, x2] to [x1, y1, width, height]
-        width = tf_coords[3] - tf_coords[1]
-        height = tf_coords[2] - tf_coords[0]
-
-        new = [tf_coords[1], tf_coords[0], width, height]  # must be a list instead of np.array
+        # change from [y1, x1, y2, x2] to [x1, y1, width, height], for all boxes at once
+        new = np.stack([tf_coords[:, 1],
+                        tf_coords[:, 0],
+                        tf_coords[:, 3] - tf_coords[:, 1],
+                        tf_coords[:, 2] - tf_coords[:, 0]], axis=1)
 
-        # convert numpy floats to Python floats
-        for i, d in enumerate(new):
-            new[i] = TFDetector.round_and_make_float(d, precision=TFDetector.COORD_DIGITS)
-        return new
+        # convert numpy floats to Python floats; must be lists instead of np.array
+        flat = truncate_float_array(new.ravel(), precision=TFDetector.COORD_DIGITS)
+        return [flat[i:i + 4] for i in range(0, len(flat), 4)]
 
     @staticmethod
     def convert_to_tf_coords(array):
@@ -205,120 +280,340 @@ class TFDetector:
 
     @staticmethod
     def __load_model(model_path):
-        """Loads a detection model (i.e., create a graph) from a .pb file.
+        """Loads a detection model (i.e., the serialized graph) from a .pb file.
 
         Args:
             model_path: .pb file of the model.
 
-        Returns: the loaded graph.
+        Returns: the loaded GraphDef.
         """
         print('TFDetector: Loading graph...')
-        detection_graph = tf.Graph()
-        with detection_graph.as_default():
-            od_graph_def = tf.GraphDef()
-            with tf.gfile.GFile(model_path, 'rb') as fid:
-                serialized_graph = fid.read()
-                od_graph_def.ParseFromString(serialized_graph)
-                tf.import_graph_def(od_graph_def, name='')
+        od_graph_def = tf.GraphDef()
+        with tf.gfile.GFile(model_path, 'rb') as fid:
+            serialized_graph = fid.read()
+            od_graph_def.ParseFromString(serialized_graph)
         print('TFDetector: Detection graph loaded.')
 
-        return detection_graph
+        return od_graph_def
+
+    @staticmethod
+    def __wrap_graph(graph_def, input_shape=(None, None, None, 3)):
+        """Imports a frozen GraphDef into a ConcreteFunction, feeding image_tensor from the
+        function argument instead of a placeholder, so it can be called eagerly without a
+        tf.Session or feed_dict.
+
+        Args:
+            graph_def: GraphDef of the detection model
+            input_shape: shape of the uint8 image batch the function accepts
 
-    def _generate_detections_one_image(self, image):
-        np_im = np.asarray(image, np.uint8)
-        im_w_batch_dim = np.expand_dims(np_im, axis=0)
+        Returns: ConcreteFunction returning [boxes, scores, classes]
+        """
+        def _import_graph_def(images):
+            return tf.import_graph_def(graph_def,
+                                       input_map={TFDetector.INPUT_TENSOR: images},
+                                       return_elements=TFDetector.OUTPUT_TENSORS,
+                                       name='')
+
+        return tf.wrap_function(_import_graph_def, [tf.TensorSpec(input_shape, tf.uint8)])
+
+    def __convert_trt(self, model_path):
+        """Replaces detect_fn with a TF-TRT FP16 version of the graph. The converted SavedModel
+        is cached next to model_path, so the TensorRT conversion only happens on the first run.
+        Falls back to the unconverted graph if TF-TRT is not available or the conversion fails
+        (e.g., TensorFlow was not built with TensorRT, or libnvinfer is missing).
+        """
+        output_keys = [name.split(':')[0] for name in TFDetector.OUTPUT_TENSORS]
+        model_base = os.path.splitext(model_path)[0]
+        saved_model_dir = model_base + '_saved_model'
+        trt_dir = model_base + '_trt_fp16'
 
-        # need to change the above line to the following if supporting a batch size > 1 and resizing to the same size
-        # np_images = [np.asarray(image, np.uint8) for image in images]
-        # images_stacked = np.stack(np_images, axis=0) if len(images) > 1 else np.expand_dims(np_images[0], axis=0)
+        try:
+            if not os.path.isdir(trt_dir):
+                from tensorflow.python.compiler.tensorrt import trt_convert as trt
+
+                print('TFDetector: Converting graph with TF-TRT (FP16)...')
+                detect_fn = self.detect_fn
+                module = tf.Module()
+                module.detect = tf.function(
+                    lambda images: dict(zip(output_keys, detect_fn(images))),
+                    input_signature=[tf.TensorSpec([None, None, None, 3], tf.uint8,
+                                                   name='images')])
+                tf.saved_model.save(module, saved_model_dir, signatures=module.detect)
+
+                conversion_params = trt.DEFAULT_TRT_CONVERSION_PARAMS._replace(
+                    precision_mode=trt.TrtPrecisionMode.FP16)
+                converter = trt.TrtGraphConverterV2(input_saved_model_dir=saved_model_dir,
+                                                    conversion_params=conversion_params)
+                converter.convert()
+                converter.save(trt_dir)
+                print('TFDetector: TF-TRT engine saved to {}.'.format(trt_dir))
+
+            trt_model = tf.saved_model.load_v2(trt_dir)
+        except (ImportError, RuntimeError, ValueError, OSError, tf.errors.OpError) as e:
+            print('TFDetector: TF-TRT conversion failed, running the graph without TensorRT: '
+                  '{}'.format(e))
+            # a partially written engine would be picked up as a valid cache on the next run
+            shutil.rmtree(trt_dir, ignore_errors=True)
+            return
+        finally:
+            # the intermediate SavedModel is only needed during the conversion
+            shutil.rmtree(saved_model_dir, ignore_errors=True)
+
+        # keep a reference to the loaded model, the signature does not own its resources
+        self.trt_model = trt_model
+        trt_fn = self.trt_model.signatures['serving_default']
+        self.detect_fn = lambda images: [trt_fn(images=images)[k] for k in output_keys]
+        self.graph_def = None
+
+    def __load_tflite(self, image_size):
+        """Creates the TFLite interpreter for images of image_size (height, width), converting
+        the frozen graph to an FP16-quantized .tflite model first if it is not cached next to
+        model_path yet.
+        """
+        height, width = image_size
+        tflite_path = '{}_fp16_{}x{}.tflite'.format(os.path.splitext(self.model_path)[0],
+                                                    height, width)
+        input_name = TFDetector.INPUT_TENSOR.split(':')[0]
+        output_names = [name.split(':')[0] for name in TFDetector.OUTPUT_TENSORS]
+
+        if not os.path.isfile(tflite_path):
+            print('TFDetector: Converting graph to FP16 TFLite for {}x{} images...'.format(
+                width, height))
+            converter = tf.lite.TFLiteConverter.from_frozen_graph(
+                self.model_path, input_arrays=[input_name], output_arrays=output_names,
+                input_shapes={input_name: [None, height, width, 3]})
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.target_spec.supported_types = [tf.float16]
+            # the second stage of the detector uses ops that are not TFLite builtins
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS,
+                                                   tf.lite.OpsSet.SELECT_TF_OPS]
+            tflite_model = converter.convert()
+            # written to a temporary file and moved into place, so an interrupted write never
+            # leaves a truncated model that would be picked up as a valid cache
+            tmp_path = tflite_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(tflite_model)
+            os.replace(tmp_path, tflite_path)
+            print('TFDetector: FP16 model saved to {}.'.format(tflite_path))
+
+        self.interpreter = tf.lite.Interpreter(model_path=tflite_path,
+                                               num_threads=os.cpu_count())
+        self.interpreter.allocate_tensors()
+        self.tflite_image_size = image_size
+        self.tflite_input_shape = tuple(self.interpreter.get_input_details()[0]['shape'])
+
+        output_indices = {d['name']: d['index'] for d in self.interpreter.get_output_details()}
+        self.tflite_input_index = self.interpreter.get_input_details()[0]['index']
+        self.tflite_output_indices = [output_indices[name] for name in output_names]
+
+    def __run_tflite(self, images_stacked, num_images):
+        image_size = images_stacked.shape[1:3]
+        if self.interpreter is None or self.tflite_image_size != image_size:
+            self.__load_tflite(image_size)
+
+        # after warmup images_stacked is always padded to batch_size, so the tensor arena is
+        # only rebuilt when the image size or batch_size changes, not on every partial batch
+        if self.tflite_input_shape != images_stacked.shape:
+            self.interpreter.resize_tensor_input(self.tflite_input_index, images_stacked.shape)
+            self.interpreter.allocate_tensors()
+            self.tflite_input_shape = images_stacked.shape
+
+        self.interpreter.set_tensor(self.tflite_input_index, images_stacked)
+        self.interpreter.invoke()
+
+        return tuple(self.interpreter.get_tensor(i)[:num_images]
+                     for i in self.tflite_output_indices)
+
+    def __fill_feed_buffer(self, images):
+        """Copies the images into the preallocated uint8 input buffer, which is only
+        reallocated when its shape changes. Once warmup has set batch_size, the buffer holds
+        batch_size images and a partial batch is padded with whatever the remaining rows hold
+        from earlier batches; the outputs for those rows are dropped. Before warmup the buffer
+        holds exactly len(images) images.
+
+        Returns: the whole buffer, of shape (batch_size or len(images), H, W, 3)
+        """
+        if self.batch_size is None:
+            feed_shape = (len(images),) + np.shape(images[0])
+        elif len(images) > self.batch_size:
+            raise ValueError('Batch of {} images is larger than the batch size {}'.format(
+                len(images), self.batch_size))
+        else:
+            feed_shape = (self.batch_size,) + np.shape(images[0])
 
-        # performs inference
-        (box_tensor_out, score_tensor_out, class_tensor_out) = self.tf_session.run(
-            [self.box_tensor, self.score_tensor, self.class_tensor],
-            feed_dict={self.image_tensor: im_w_batch_dim})
+        if self.feed_buf is None or self.feed_buf.shape != feed_shape:
+            self.feed_buf = np.zeros(feed_shape, np.uint8)
 
-        return box_tensor_out, score_tensor_out, class_tensor_out
+        for i, image in enumerate(images):
+            np.copyto(self.feed_buf[i], np.asarray(image, np.uint8))
 
-    def generate_detections_one_image(self, image, image_id,
-                                      detection_threshold=DEFAULT_OUTPUT_CONFIDENCE_THRESHOLD):
-        print(detection_threshold)
-        """Apply the detector to an image.
+        return self.feed_buf
+
+    def _generate_detections_batch(self, images):
+        # the inference calls below copy their input, so the buffer is free to be reused
+        images_stacked = self.__fill_feed_buffer(images)
+        num_images = len(images)
+
+        if self.precision == 'fp16':
+            return self.__run_tflite(images_stacked, num_images)
+
+        # performs inference; outputs have shapes (batch_size, 100, 4), (batch_size, 100) and
+        # (batch_size, 100), of which the first num_images rows belong to the input images
+        (box_tensor_out, score_tensor_out, class_tensor_out) = self.detect_fn(
+            tf.constant(images_stacked))
+
+        return (box_tensor_out[:num_images].numpy(),
+                score_tensor_out[:num_images].numpy(),
+                class_tensor_out[:num_images].numpy())
+
+    def warmup(self, batch_shape):
+        """Prepares the detector for batches of batch_shape (N, H, W, 3) and runs it once on a
+        blank batch, so that kernel selection and XLA/TensorRT/TFLite compilation happen here
+        rather than on the first real frames. Batches of fewer than N images are padded to N,
+        so every call has this shape.
+
+        For the FP32 graph, this also replaces the dynamic-shape function with one whose input
+        has exactly this static shape, which lets TF plan its kernels once for it. The GraphDef
+        and the dynamic-shape function are released, so after this the detector only accepts
+        images of size (H, W) until warmup is called again with the new shape, which reloads
+        the GraphDef from model_path.
+        """
+        batch_shape = tuple(batch_shape)
+        self.batch_size = batch_shape[0]
+        if self.precision == 'fp32' and self.trt_model is None:
+            print('TFDetector: Specializing graph to input shape {}...'.format(batch_shape))
+            graph_def = self.graph_def
+            if graph_def is None:
+                graph_def = TFDetector.__load_model(self.model_path)
+            self.detect_fn = TFDetector.__wrap_graph(graph_def, batch_shape)
+            self.graph_def = None
+        self._generate_detections_batch(np.zeros(batch_shape, np.uint8))
+
+    @staticmethod
+    def __convert_detections(image_id, boxes, scores, classes, detection_threshold):
+        """Converts the model outputs for a single image to the API output format.
+
+        Returns: a tuple of the result dict (see generate_detections_batch) and the animal flag
+        """
+        result = {
+            'file': image_id
+        }
+        # select the confident, non-vehicle detections for all proposals at once; only the
+        # (usually very few) selected ones are turned into Python objects
+        mask = (scores > detection_threshold) & (classes != 3)
+        sel_boxes = boxes[mask]
+        sel_scores = scores[mask]
+        sel_classes = classes[mask].astype(np.int32)
+
+        # will be empty for an image with no confident detections
+        detections_cur_image = [
+            {
+                'category': str(c),  # use string type for the numerical class label, not int
+                'conf': conf,
+                'bbox': bbox
+            }
+            for c, conf, bbox in zip(sel_classes.tolist(),
+                                     truncate_float_array(sel_scores,
+                                                          precision=TFDetector.CONF_DIGITS),
+                                     TFDetector.__convert_coords(sel_boxes))
+        ]
+        max_detection_conf = sel_scores.max(initial=0.0)
+        animal = int((sel_classes == 1).any())
+
+        result['max_detection_conf'] = truncate_float(float(max_detection_conf),
+                                                      precision=TFDetector.CONF_DIGITS)
+        result['detections'] = detections_cur_image
+
+        return result, animal
+
+    def generate_detections_batch(self, images, image_ids,
+                                  detection_threshold=DEFAULT_OUTPUT_CONFIDENCE_THRESHOLD):
+        """Apply the detector to a batch of same-sized images with a single inference call.
 
         Args:
-            image: the PIL Image object
-            image_id: a path to identify the image; will be in the "file" field of the output object
+            images: list of RGB uint8 images (np.ndarray or PIL Image), all with the same width
+                and height
+            image_ids: list of paths to identify the images; will be in the "file" field of the outputs
             detection_threshold: confidence above which to include the detection proposal
 
         Returns:
-        A dict with the following fields, see the 'images' key in https://github.com/microsoft/CameraTraps/tree/master/api/batch_processing#batch-processing-api-output-format
+        A list with one (result, animal) tuple per image, in the order of `images`, where result is
+        a dict with the following fields, see the 'images' key in https://github.com/microsoft/CameraTraps/tree/master/api/batch_processing#batch-processing-api-output-format
             - 'file' (always present)
             - 'max_detection_conf'
             - 'detections', which is a list of detection objects containing keys 'category', 'conf' and 'bbox'
             - 'failure'
         """
-        animal = 0
-        result = {
-            'file': image_id
-        }
         try:
-            b_box, b_score, b_class = self._generate_detections_one_image(image)
-
-            # our batch size is 1; need to loop the batch dim if supporting batch size > 1
-            boxes, scores, classes = b_box[0], b_score[0], b_class[0]
-
-            detections_cur_image = []  # will be empty for an image with no confident detections
-            max_detection_conf = 0.0
-            for b, s, c in zip(boxes, scores, classes):
-                if c == 3:
-                    continue
-                # define confidance here
-                if s > detection_threshold:
-                    detection_entry = {
-                        'category': str(int(c)),  # use string type for the numerical class label, not int
-                        'conf': truncate_float(float(s),  # cast to float for json serialization
-                                               precision=TFDetector.CONF_DIGITS),
-                        'bbox': TFDetector.__convert_coords(b)
-                    }
-                    detections_cur_image.append(detection_entry)
-                    if s > max_detection_conf:
-                        max_detection_conf = s
-                if int(c) == 1:
-                    animal=1      
-            result['max_detection_conf'] = truncate_float(float(max_detection_conf),
-                                                          precision=TFDetector.CONF_DIGITS)
-            result['detections'] = detections_cur_image
-
+            b_box, b_score, b_class = self._generate_detections_batch(images)
         except Exception as e:
-            result['failure'] = TFDetector.FAILURE_TF_INFER
-            # print('TFDetector: image {} failed during inference: {}'.format(image_id, str(e)))
+            # print('TFDetector: batch failed during inference: {}'.format(str(e)))
+            return [({'file': image_id, 'failure': TFDetector.FAILURE_TF_INFER}, 0)
+                    for image_id in image_ids]
+
+        results = []
+        for boxes, scores, classes, image_id in zip(b_box, b_score, b_class, image_ids):
+            try:
+                results.append(TFDetector.__convert_detections(image_id, boxes, scores, classes,
+                                                               detection_threshold))
+            except Exception as e:
+                results.append(({'file': image_id, 'failure': TFDetector.FAILURE_TF_INFER}, 0))
+                # print('TFDetector: image {} failed during inference: {}'.format(image_id, str(e)))
+
+        return results
+
+    def generate_detections_one_image(self, image, image_id,
+                                      detection_threshold=DEFAULT_OUTPUT_CONFIDENCE_THRESHOLD):
+        """Apply the detector to an image. See generate_detections_batch for the output format.
 
-        return result , animal
+        Args:
+            image: RGB uint8 image, np.ndarray or PIL Image
+            image_id: a path to identify the image; will be in the "file" field of the output object
+            detection_threshold: confidence above which to include the detection proposal
+
+        Returns: a tuple of the result dict and the animal flag (1 if an animal was found, else 0)
+        """
+        return self.generate_detections_batch([image], [image_id],
+                                              detection_threshold=detection_threshold)[0]
 
 
 #%% Main function
-tf_detector = TFDetector('md_v4.1.0.pb')
-def load_and_run_detector(image_file):
+# set MD_PRECISION=fp16 to run the FP16 TFLite model instead of the FP32 graph, and
+# MD_USE_TRT=1 to run the FP32 graph through TF-TRT (needs a TensorRT-enabled TF build)
+tf_detector = TFDetector('md_v4.1.0.pb', precision=os.environ.get('MD_PRECISION', 'fp32'),
+                         use_trt=os.environ.get('MD_USE_TRT') == '1')
+def load_and_run_detector_batch(image_files):
+    """Runs the detector on a list of same-sized BGR frames (np.ndarray, as read by OpenCV) in
+    one inference call and renders the bounding boxes. Returns a list of (rendered BGR frame,
+    animal flag) tuples."""
     now = datetime.now()
     current_time = now.strftime("%H:%M:%S")
     print("start time =", current_time)
     render_confidence_threshold=TFDetector.DEFAULT_RENDERING_CONFIDENCE_THRESHOLD
-    detection_results = []
-    image = PIL.Image.fromarray(numpy.uint8(image_file))
-    # print(image_file)
-    
-    result,flag = tf_detector.generate_detections_one_image(image, image_file)
-    print(result)
-    detection_results.append(result)
-    viz_utils.render_detection_bounding_boxes(result['detections'], image,
-                                            label_map=TFDetector.DEFAULT_DETECTOR_LABEL_MAP,
-                                            confidence_threshold=render_confidence_threshold)
-
-    im = numpy.asarray(image)          
+    # the model expects RGB; reversing the channel axis is a view, the only copy made is when
+    # the frames are stacked into the input batch
+    rgb_images = [image_file[..., ::-1] for image_file in image_files]
+
+    detection_results = tf_detector.generate_detections_batch(rgb_images, image_files)
+    outputs = []
+    for image_file, (result, flag) in zip(image_files, detection_results):
+        print(result)
+        # most camera trap frames have nothing to draw; return those as they came in, without
+        # the copies into and out of a PIL image
+        if not any(d['conf'] >= viz_utils.MIN_RENDER_CONFIDENCE
+                   for d in result.get('detections', [])):
+            outputs.append((image_file, flag))
+            continue
+        image = PIL.Image.fromarray(image_file)
+        viz_utils.render_detection_bounding_boxes(result.get('detections', []), image,
+                                                label_map=TFDetector.DEFAULT_DETECTOR_LABEL_MAP,
+                                                confidence_threshold=render_confidence_threshold)
+        outputs.append((numpy.asarray(image), flag))
     now = datetime.now()
     current_time = now.strftime("%H:%M:%S")
     print("End time =", current_time)
-    return im,flag
+    return outputs
 
 
-
-    
\ No newline at end of file
+def load_and_run_detector(image_file):
+    return load_and_run_detector_batch([image_file])[0]
@@ -1,12 +1,15 @@
 
 # from imutils import build_montages
 # from datetime import datetime
+from collections import deque
+import threading
+import time
 import numpy as np
 import imagezmq
 # import argparse
-import imutils
 import cv2
 import run_tf_detector as detect
+from motion_gate import MotionGate
 import winsound
 
 
@@ -19,30 +22,128 @@ def send_notification():
 	winsound.Beep(frequency,duration)
 
 
+# minimum number of seconds between two beeps, so a continuous animal event does not keep
+# beeping on every batch
+BEEP_INTERVAL = 5.0
+last_beep = None
+
+def beep_async(frequency, duration):
+	# winsound.Beep blocks for the whole duration; run it on a background thread so frames
+	# keep being received and displayed
+	global last_beep
+	now = time.monotonic()
+	if last_beep is not None and now - last_beep < BEEP_INTERVAL:
+		return
+	last_beep = now
+	threading.Thread(target=winsound.Beep, args=(frequency, duration), daemon=True).start()
+
+
+# frames are batched for the detector; a batch is flushed once it is full or once its oldest
+# frame has waited FLUSH_INTERVAL seconds, which bounds the added display latency
+BATCH_SIZE = 4
+FLUSH_INTERVAL = 0.05
+
+# width frames are resized to before display and detection
+FRAME_WIDTH = 1200
+
+# (frame, run_detector) pairs in arrival order; static frames skip the detector but are still
+# shown, in order with the detected frames around them
+pending = deque()
+num_moving = 0
+deadline = 0.0
+gate = MotionGate()
+
+# frames are resized into a ring of preallocated buffers; a batch never holds more than
+# BATCH_SIZE moving frames, so the buffer being written is never one that is still queued
+# (queued static frames are copied out of the ring)
+resize_bufs = [None] * BATCH_SIZE
+buf_index = 0
+
+# the detector is compiled for batches of BATCH_SIZE resized frames of this shape, on the
+# first frame and again whenever the client's resolution changes; partial batches are padded
+# to BATCH_SIZE, so every call reuses the compiled shape
+warmed_up_shape = None
+
+def flush_pending():
+	global num_moving
+	moving = [frame for frame, run_detector in pending if run_detector]
+	results = iter(detect.load_and_run_detector_batch(moving))
+
+	animal = 0
+	for frame, run_detector in pending:
+		if run_detector:
+			res, flag = next(results)
+			animal = animal or flag
+		else:
+			res = frame
+		cv2.imshow("animal_detection",res)
+		# cv2.imshow("animal_detection",detect.load_and_run_detector(frame))
+		key = cv2.waitKey(1) & 0xFF
+		if key == ord("q"):
+			break
+
+	pending.clear()
+	num_moving = 0
+
+	if animal == 1:
+		frequency = 2500
+		duration = 500
+		beep_async(frequency,duration)
+
+	return key
+
+
 while True:
-	(rpiName, frame) = imageHub.recv_image()
+	if pending:
+		# wait for the next frame only until the pending batch is due
+		timeout = max(0.0, deadline - time.monotonic())
+		if not imageHub.zmq_socket.poll(int(timeout * 1000)):
+			if flush_pending() == ord("q"):
+				break
+			continue
+
+	(rpiName, jpg_buffer) = imageHub.recv_jpg()
 	imageHub.send_reply(b'OK')
+	frame = cv2.imdecode(np.frombuffer(jpg_buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
 
-	frame = imutils.resize(frame, width=1200)
 	(h, w) = frame.shape[:2]
-	blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)),
-		0.007843, (300, 300), 127.5)
+	size = (FRAME_WIDTH, int(h * FRAME_WIDTH / float(w)))
+	buf = resize_bufs[buf_index]
+	if buf is None or buf.shape[:2] != (size[1], size[0]):
+		buf = resize_bufs[buf_index] = np.empty((size[1], size[0], 3), np.uint8)
+	frame = cv2.resize(frame, size, dst=buf, interpolation=cv2.INTER_AREA)
+
+	if frame.shape != warmed_up_shape:
+		# frames already queued have the old shape and must be run before recompiling
+		if pending and flush_pending() == ord("q"):
+			break
+		detect.tf_detector.warmup((BATCH_SIZE,) + frame.shape)
+		warmed_up_shape = frame.shape
 
 
 	cv2.putText(frame, rpiName, (10, 25),
 		cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
 
-	res,flag = detect.load_and_run_detector(frame)
-
-	cv2.imshow("animal_detection",res)
-	# cv2.imshow("animal_detection",detect.load_and_run_detector(frame))
-
-	if flag == 1:
-		frequency = 2500
-		duration = 500
-		winsound.Beep(frequency,duration)
-
-	key = cv2.waitKey(1) & 0xFF
+	run_detector = gate.has_motion(frame)
+	if not run_detector and not pending:
+		# static scene: skip the detector, but still show the current frame
+		cv2.imshow("animal_detection",frame)
+		key = cv2.waitKey(1) & 0xFF
+	else:
+		if not pending:
+			deadline = time.monotonic() + FLUSH_INTERVAL
+		if run_detector:
+			pending.append((frame, True))
+			num_moving += 1
+			buf_index = (buf_index + 1) % BATCH_SIZE
+		else:
+			# the ring buffer slot is reused by the next frame
+			pending.append((frame.copy(), False))
+
+		if num_moving >= BATCH_SIZE or time.monotonic() >= deadline:
+			key = flush_pending()
+		else:
+			key = cv2.waitKey(1) & 0xFF
 
 
 
@@ -1,43 +1,99 @@
+import queue
+import threading
+
 import cv2
 import run_tf_detector as detect
+from motion_gate import MotionGate
 
+# frames are buffered and sent to the detector BATCH_SIZE at a time
+BATCH_SIZE = detect.TFDetector.BATCH_SIZE
 
-
-def enchance_img(frame):
-    temp_img = frame 
-    wb = cv2.xphoto.createGrayworldWB()
-    wb.setSaturationThreshold(0.99)
-    img_wb = wb.balanceWhite(temp_img)
-    img_lab = cv2.cvtColor(img_wb,cv2.COLOR_BGR2LAB)
-    l,a,b = cv2.split(img_lab)
-    # print(type(l))
-    # g_l = cv2.cvtColor(l,cv2.COLOR_BGR2GRAY)
-    clahe = cv2.createCLAHE(clipLimit=6,tileGridSize=(8,8))
-    img_l = clahe.apply(l)
-    img_clahe = cv2.merge((img_l,a,b))
-    return cv2.cvtColor(img_clahe,cv2.COLOR_Lab2BGR)
+# decoding, detection and encoding each run in their own thread, connected by bounded queues
+QUEUE_SIZE = 8
+END_OF_STREAM = object()
 
 vidObj = cv2.VideoCapture("pets-on-cctv.mp4")
-count=0
-img_array = []
-while count!=1000:
-
-  success, image = vidObj.read()
-  if success:
-#   im = detect.load_and_run_detector(enchance_img(image))
-    im,flag = detect.load_and_run_detector(image)
-    img = im
-    height, width, layers = img.shape
-    size = (width,height)
-    img_array.append(img)
-  # print(count)
-  else:
-        break
-  count += 1
-    
+
+# the first frame is read up front to size the writer, so results are written as soon as they
+# come out of the detector instead of being held in memory until the end
+success, image = vidObj.read()
+height, width, layers = image.shape
+size = (width,height)
+
+# all frames of the video share this shape; compile the detector for full batches of it now
+detect.tf_detector.warmup((BATCH_SIZE,) + image.shape)
 out = cv2.VideoWriter('pets-on-cctvresult.mp4',cv2.VideoWriter_fourcc(*'DIVX'), 15, size)
-# video = cv2.VideoWriter(video_name, 0, 1, (width, height)) 
+# video = cv2.VideoWriter(video_name, 0, 1, (width, height))
+
+q_in = queue.Queue(maxsize=QUEUE_SIZE)
+q_out = queue.Queue(maxsize=QUEUE_SIZE)
+
+
+def read_frames(success, image):
+  count=0
+  while count!=1000:
+    if success:
+      q_in.put(image)
+    # print(count)
+    else:
+          break
+    count += 1
+    success, image = vidObj.read()
+  q_in.put(END_OF_STREAM)
+
+
+def flush_frames(frames):
+  """Runs the moving frames through the detector and queues one output per (frame, moving)
+  entry; a static frame is written as it is."""
+  moving = [frame for frame, has_motion in frames if has_motion]
+  results = iter(detect.load_and_run_detector_batch(moving) if moving else [])
+  for frame, has_motion in frames:
+    if has_motion:
+      frame, flag = next(results)
+    q_out.put(frame)
+  frames.clear()
+
+
+def detect_frames():
+  # OpenCV's thread pool is process-wide; keep it from competing with TF for the cores
+  cv2.setNumThreads(1)
+  gate = MotionGate()
+  # (frame, moving) pairs waiting for the next batch, in video order; static frames skip
+  # the detector and are written unchanged
+  frames = []
+  num_moving = 0
+  try:
+    while True:
+      image = q_in.get()
+      if image is END_OF_STREAM:
+        break
+      if gate.has_motion(image):
+        frames.append((image, True))
+        num_moving += 1
+      else:
+        frames.append((image, False))
+      if num_moving == BATCH_SIZE:
+        flush_frames(frames)
+        num_moving = 0
+    if frames:
+      flush_frames(frames)
+  finally:
+    q_out.put(END_OF_STREAM)
+
+
+def write_frames():
+  while True:
+    img = q_out.get()
+    if img is END_OF_STREAM:
+      break
+    out.write(img)
+
+
+reader = threading.Thread(target=read_frames, args=(success, image), daemon=True)
+detector = threading.Thread(target=detect_frames, daemon=True)
+writer = threading.Thread(target=write_frames, daemon=True)
+for thread in (reader, detector, writer):
+  thread.start()
 
-for i in range(len(img_array)):
-  out.write(img_array[i])
-out.release() 
\ No newline at end of file
+writer.join()
+out.release()
@@ -32,6 +32,9 @@ DEFAULT_DETECTOR_LABEL_MAP = {
     str(k): v for k, v in detector_bbox_category_id_to_name.items()
 }
 
+# render_detection_bounding_boxes draws every detection at or above this confidence
+MIN_RENDER_CONFIDENCE = 0.2
+
 # Retry on blob storage read failures
 n_retries = 10
 retry_sleep_time = 0.01
@@ -328,7 +331,7 @@ def render_detection_bounding_boxes(detections, image,
     for detection in detections:
 
         score = detection['conf']
-        if score >= 0.2:
+        if score >= MIN_RENDER_CONFIDENCE:
 
             x1, y1, w_box, h_box = detection['bbox']
             display_boxes.append([y1, x1, y1 + h_box, x1 + w_box])